@@ -0,0 +1,130 @@
+"""
+Pattern analytics over the full draw history.
+
+Every statistic is computed in one vectorized NumPy pass over an (N, 5)
+mains array and an (N, 2) stars array. Results are cached in process memory
+keyed on the latest stored draw_date, so the history is only re-read once
+per new draw; in between, a request costs one latest-draw lookup. Any
+inserted or updated draw (including corrections to old ones reported by other
+processes) drops the cache.
+"""
+import threading
+
+import numpy as np
+
+from .db import get_latest_draw, iter_draws, on_draw_change
+
+MAIN_MAX = 50
+STAR_MAX = 12
+LOW_MAX = 25  # mains 1-25 count as "low", 26-50 as "high"
+DECADES = ("1-10", "11-20", "21-30", "31-40", "41-50")
+
+_cache = {"key": None, "result": None}
+_lock = threading.Lock()
+
+
+def _histogram(values, minlength=0, offset=0):
+    """{value: count} for every value that occurs, keyed as strings for JSON."""
+    counts = np.bincount(values, minlength=minlength)
+    return {str(i + offset): int(c) for i, c in enumerate(counts[offset:]) if c or minlength}
+
+
+def load_arrays(rows):
+    """
+    Build sorted (N, 5) mains and (N, 2) stars arrays plus the date range from
+    draw rows. Rows without exactly five mains and two stars are skipped.
+    """
+    mains, stars, dates = [], [], []
+    for row in rows:
+        n = row.get("numbers") or []
+        s = row.get("stars") or []
+        if len(n) == 5 and len(s) == 2:
+            mains.append(n)
+            stars.append(s)
+            dates.append(row.get("draw_date"))
+    mains = np.sort(np.asarray(mains, dtype=np.int64).reshape(-1, 5), axis=1)
+    stars = np.sort(np.asarray(stars, dtype=np.int64).reshape(-1, 2), axis=1)
+    return mains, stars, dates
+
+
+def compute_analytics(mains, stars):
+    """All distributions for sorted mains (N, 5) and stars (N, 2) arrays."""
+    n = len(mains)
+    if not n:
+        return {"draws": 0}
+
+    sums = mains.sum(axis=1)
+    odd = (mains % 2).sum(axis=1)
+    low = (mains <= LOW_MAX).sum(axis=1)
+
+    # Consecutive numbers: adjacent sorted mains differing by one
+    step = np.diff(mains, axis=1) == 1
+    run = np.zeros(n, dtype=np.int64)
+    longest = np.zeros(n, dtype=np.int64)
+    for j in range(step.shape[1]):
+        run = (run + 1) * step[:, j]
+        longest = np.maximum(longest, run)
+
+    decade = (mains - 1) // 10
+    present = np.zeros((n, len(DECADES)), dtype=bool)
+    present[np.arange(n)[:, None], decade] = True
+
+    pair_index = (stars[:, 0] - 1) * STAR_MAX + (stars[:, 1] - 1)
+    pair_counts = np.bincount(pair_index, minlength=STAR_MAX * STAR_MAX)
+    pairs = [
+        {"pair": [int(i // STAR_MAX) + 1, int(i % STAR_MAX) + 1], "count": int(pair_counts[i])}
+        for i in np.argsort(-pair_counts, kind="stable")
+        if pair_counts[i]
+    ]
+
+    return {
+        "draws": n,
+        "sum": {
+            "min": int(sums.min()),
+            "max": int(sums.max()),
+            "mean": round(float(sums.mean()), 2),
+            "median": float(np.median(sums)),
+            "std": round(float(sums.std()), 2),
+            "histogram": _histogram(sums),
+        },
+        "odd_even": {f"{k}/{5 - k}": int(c) for k, c in enumerate(np.bincount(odd, minlength=6))},
+        "low_high": {f"{k}/{5 - k}": int(c) for k, c in enumerate(np.bincount(low, minlength=6))},
+        "consecutive": {
+            "pairs": _histogram(step.sum(axis=1), minlength=5),
+            "longest_run": _histogram(longest + 1, minlength=6, offset=1),
+        },
+        "decades": {
+            "distinct": _histogram(present.sum(axis=1), minlength=6, offset=1),
+            "numbers": dict(zip(DECADES, (int(c) for c in np.bincount(decade.ravel(), minlength=len(DECADES))))),
+        },
+        "star_pairs": pairs,
+    }
+
+
+def get_analytics():
+    """
+    Cached analytics for the stored history, recomputed only when the latest
+    draw_date changes. Returns None when no draws are stored.
+    """
+    latest = get_latest_draw()
+    if not latest:
+        return None
+    key = str(latest["draw_date"])[:10]
+    if _cache["key"] == key:
+        return _cache["result"]
+    with _lock:
+        # Another request may have recomputed while we waited
+        if _cache["key"] != key:
+            mains, stars, dates = load_arrays(iter_draws())
+            result = compute_analytics(mains, stars)
+            if dates:
+                result["first_draw"] = str(dates[-1])[:10]
+                result["latest_draw"] = str(dates[0])[:10]
+            _cache["result"] = result
+            _cache["key"] = key
+        return _cache["result"]
+
+
+@on_draw_change
+def _on_draw_change(draw_date, change):
+    _cache["key"] = None
@@ -0,0 +1,92 @@
+"""
+EuroMillions draw schedule.
+
+Draws started on Friday 13 February 2004 and have run every Tuesday and
+Friday since 10 May 2011 (Fridays only before that). Results are treated as
+published from PUBLICATION_TIME_UTC on the draw day; the draw itself takes
+place around 20:05 UTC in winter and 19:05 UTC in summer.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+FIRST_DRAW = date(2004, 2, 13)
+TUESDAY_DRAWS_FROM = date(2011, 5, 10)
+
+TUESDAY = 1
+FRIDAY = 4
+
+
+def _publication_time():
+    raw = os.getenv("DRAW_PUBLICATION_UTC", "21:00")
+    try:
+        hh, mm = raw.split(":")
+        return time(int(hh), int(mm))
+    except Exception:
+        return time(21, 0)
+
+
+PUBLICATION_TIME_UTC = _publication_time()
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+def is_draw_day(d):
+    """True if a draw takes place on date `d`."""
+    d = _as_date(d)
+    if d < FIRST_DRAW:
+        return False
+    if d.weekday() == FRIDAY:
+        return True
+    return d.weekday() == TUESDAY and d >= TUESDAY_DRAWS_FROM
+
+
+def previous_draw_date(d):
+    """Most recent draw date on or before `d`, or None before the first draw."""
+    d = _as_date(d)
+    while d >= FIRST_DRAW:
+        if is_draw_day(d):
+            return d
+        d -= timedelta(days=1)
+    return None
+
+
+def next_draw_date(d):
+    """First draw date strictly after `d`."""
+    d = max(_as_date(d) + timedelta(days=1), FIRST_DRAW)
+    while not is_draw_day(d):
+        d += timedelta(days=1)
+    return d
+
+
+def draw_dates_between(start, end):
+    """All draw dates in the inclusive range [start, end], oldest first."""
+    start = max(_as_date(start), FIRST_DRAW)
+    end = _as_date(end)
+    out = []
+    d = start
+    while d <= end:
+        if is_draw_day(d):
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def expected_latest_draw(now=None):
+    """
+    The newest draw whose results should already be published at `now`
+    (an aware or UTC-naive datetime; defaults to the current time).
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    elif now.tzinfo is not None:
+        now = now.astimezone(timezone.utc)
+    today = now.date()
+    if is_draw_day(today) and now.time().replace(tzinfo=None) < PUBLICATION_TIME_UTC:
+        today -= timedelta(days=1)
+    return previous_draw_date(today)
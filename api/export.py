@@ -0,0 +1,108 @@
+"""
+Compact bulk export encoders for draw history.
+
+CSV layout (one header row, newest draw first):
+
+    draw_date,n1,n2,n3,n4,n5,s1,s2
+
+Both formats skip draws without exactly 5 mains and 2 stars.
+
+Packed binary layout: a headerless sequence of fixed-width little-endian
+records, newest draw first, RECORD_SIZE (14) bytes each:
+
+    offset  size  type    field
+    0       4     uint32  day    days since 1970-01-01
+    4       8     uint64  mains  bit n set for main number n (1-50)
+    12      2     uint16  stars  bit n set for lucky star n (1-12)
+
+NumPy clients can load the whole history in one call, taking the dtype
+from this module or from the response's X-Record-Dtype header (DTYPE_SPEC
+as JSON):
+
+    arr = numpy.frombuffer(body, dtype=numpy.dtype(json.loads(resp.headers['X-Record-Dtype'])))
+    dates = arr['day'].astype('datetime64[D]')
+"""
+import csv
+import io
+import json
+import struct
+import threading
+from datetime import date, datetime
+
+RECORD = struct.Struct('<IQH')
+RECORD_SIZE = RECORD.size
+NUMPY_DTYPE = [('day', '<u4'), ('mains', '<u8'), ('stars', '<u2')]
+# Same layout in the dict form numpy.dtype() accepts once decoded from JSON
+DTYPE_SPEC = {"names": [n for n, _ in NUMPY_DTYPE], "formats": [f for _, f in NUMPY_DTYPE]}
+DTYPE_HEADER = json.dumps(DTYPE_SPEC, separators=(',', ':'))
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# (format, year) -> (data_version, payload)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def bitmask(values):
+    """Pack ball numbers into an int with bit n set for number n."""
+    mask = 0
+    for v in values or []:
+        mask |= 1 << int(v)
+    return mask
+
+
+def _complete_draws(rows):
+    """(date, sorted mains, sorted stars) for rows with 5 mains and 2 stars; others are skipped."""
+    for row in rows:
+        numbers = sorted(row.get('numbers') or [])
+        stars = sorted(row.get('stars') or [])
+        if len(numbers) != 5 or len(stars) != 2:
+            continue
+        yield _as_date(row['draw_date']), numbers, stars
+
+
+def encode_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(['draw_date', 'n1', 'n2', 'n3', 'n4', 'n5', 's1', 's2'])
+    for day, numbers, stars in _complete_draws(rows):
+        writer.writerow([day.isoformat(), *numbers, *stars])
+    return buf.getvalue().encode('utf-8')
+
+
+def encode_packed(rows):
+    out = bytearray()
+    for day, numbers, stars in _complete_draws(rows):
+        out += RECORD.pack(day.toordinal() - _EPOCH_ORDINAL, bitmask(numbers), bitmask(stars))
+    return bytes(out)
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'bin': encode_packed,
+}
+
+
+def get_export(fmt, version, rows_factory, year=None):
+    """
+    Return the encoded payload for `fmt`, rebuilding it only when the data
+    version differs from the cached one. `rows_factory` is called lazily.
+    """
+    key = (fmt, year)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached and version is not None and cached[0] == version:
+        return cached[1]
+    payload = ENCODERS[fmt](rows_factory())
+    if version is not None:
+        with _cache_lock:
+            _cache[key] = (version, payload)
+    return payload
@@ -0,0 +1,446 @@
+"""
+Asyncio fetch engine used by the sync routes.
+
+Blocking `requests` calls run in worker threads so many pages can be in flight
+at once, while a global semaphore bounds total concurrency and a token bucket
+per host keeps us under the source sites' rate limits. Results are pushed onto
+a queue as they complete so callers can parse pages while others are still
+downloading. A sync-wide Deadline caps every request's timeout, and a
+per-host CircuitBreaker skips hosts that keep failing. Requests can be
+recorded to, or replayed from, a fixture bundle (see api/replay.py).
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.8",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0 Safari/537.36"
+}
+
+# Statuses where the server is asking us to slow down and come back later
+RETRY_STATUSES = (429, 503)
+
+DEADLINE_EXCEEDED = "deadline exceeded"
+CIRCUIT_OPEN = "circuit open"
+
+
+class FetchSkipped(Exception):
+    """Raised by guarded_get() when the deadline has passed or the host's circuit is open."""
+
+
+class Deadline:
+    """A fixed point in time that every fetch of one sync run must finish by."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, timeout):
+        """Cap a requests timeout (seconds or a (connect, read) tuple) to the time left."""
+        left = max(self.remaining(), 0.001)
+        if isinstance(timeout, tuple):
+            return tuple(min(t, left) for t in timeout)
+        return min(timeout, left)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker, one instance per sync run. A host's circuit
+    opens after `failure_threshold` consecutive runs with a connection
+    error/timeout/5xx response (concurrent fetches failing together in one
+    run count once), or after `not_found_threshold` consecutive 404s with no
+    success in between. It stays open for `cooldown` seconds, doubling on
+    each re-trip up to `max_cooldown`. Once the cooldown has passed, requests
+    are let through again: one success closes the circuit, and one more
+    failing run re-opens it.
+
+    `states` maps host -> {failures, not_found, trips, opened_until (epoch
+    seconds), last_error} and is what db.load_host_health()/save_host_health()
+    persist between runs. Pass `loader` instead to fetch them on first use.
+    """
+
+    def __init__(self, states=None, failure_threshold=3, not_found_threshold=18,
+                 cooldown=3600.0, max_cooldown=86400.0, loader=None):
+        self._loader = loader
+        self.states = {h: dict(st) for h, st in (states or {}).items()}
+        self.failure_threshold = failure_threshold
+        self.not_found_threshold = not_found_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.dirty = set()
+        # Hosts that already had a failure counted this run
+        self._failed = set()
+        # record() runs on the fetch worker threads
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            for h, st in (loader() or {}).items():
+                self.states.setdefault(h, dict(st))
+
+    def _state(self, host):
+        st = self.states.get(host)
+        if st is None:
+            st = {"failures": 0, "not_found": 0, "trips": 0, "opened_until": None, "last_error": None}
+            self.states[host] = st
+        return st
+
+    def allow(self, url):
+        with self._lock:
+            self._load()
+            st = self.states.get(urlparse(url).netloc)
+        return not st or not st["opened_until"] or st["opened_until"] <= time.time()
+
+    def record(self, url, status=None, error=None):
+        """Feed the outcome of one request: an HTTP status, or an error string."""
+        with self._lock:
+            self._load()
+            self._record(urlparse(url).netloc, status, error)
+
+    def _record(self, host, status, error):
+        st = self._state(host)
+        self.dirty.add(host)
+        if error is None and status is not None and status < 500 and status != 404:
+            if status < 400:
+                st.update(failures=0, not_found=0, trips=0, opened_until=None, last_error=None)
+            return
+        if status == 404:
+            st["not_found"] += 1
+            st["last_error"] = "404"
+        else:
+            if host not in self._failed:
+                self._failed.add(host)
+                st["failures"] += 1
+            st["last_error"] = error or f"HTTP {status}"
+        if st["opened_until"] and st["opened_until"] > time.time():
+            # Already open; late results from requests in flight don't re-trip it
+            return
+        if st["failures"] >= self.failure_threshold or st["not_found"] >= self.not_found_threshold:
+            st["opened_until"] = time.time() + min(self.max_cooldown, self.cooldown * 2 ** st["trips"])
+            st["trips"] += 1
+
+    def open_hosts(self):
+        now = time.time()
+        return sorted(h for h, st in self.states.items() if st["opened_until"] and st["opened_until"] > now)
+
+    def changed(self):
+        """States touched since construction, for persisting."""
+        return {h: self.states[h] for h in self.dirty}
+
+
+_transport = None
+_transport_loaded = False
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """The installed record/replay transport (see api/replay.py), or None for live fetches."""
+    global _transport, _transport_loaded
+    if not _transport_loaded:
+        with _transport_lock:
+            if not _transport_loaded:
+                from .replay import from_env
+                _transport = from_env()
+                _transport_loaded = True
+    return _transport
+
+
+def set_transport(transport):
+    """Route every guarded_get() through `transport` (None for live); returns the previous one."""
+    global _transport, _transport_loaded
+    with _transport_lock:
+        previous = _transport if _transport_loaded else None
+        _transport, _transport_loaded = transport, True
+    return previous
+
+
+def guarded_get(url, deadline=None, breaker=None, timeout=(5, 20), headers=None, session=None,
+                bypass_circuit=False):
+    """
+    requests.get() that honours a Deadline and a CircuitBreaker: raises
+    FetchSkipped instead of fetching when out of time or the host is open
+    (unless bypass_circuit), and reports the outcome to the breaker.
+    Timeouts the deadline shortened are not held against the host.
+    """
+    if breaker is not None and not bypass_circuit and not breaker.allow(url):
+        raise FetchSkipped(f"{CIRCUIT_OPEN} for {urlparse(url).netloc}")
+    capped = False
+    if deadline is not None:
+        if deadline.expired:
+            raise FetchSkipped(DEADLINE_EXCEEDED)
+        limited = deadline.timeout(timeout)
+        capped = limited != timeout
+        timeout = limited
+    try:
+        transport = get_transport()
+        if transport is not None:
+            resp = transport.get(url, timeout=timeout, headers=headers or DEFAULT_HEADERS, session=session)
+        else:
+            resp = (session or requests).get(url, timeout=timeout, headers=headers or DEFAULT_HEADERS)
+    except Exception as e:
+        if breaker is not None and not (capped and isinstance(e, requests.Timeout)):
+            breaker.record(url, error=str(e))
+        raise
+    # Replays answer URLs missing from the bundle with a synthetic 404
+    if breaker is not None and not getattr(resp, "replay_unrecorded", False):
+        breaker.record(url, status=resp.status_code)
+    return resp
+
+
+class FetchResult:
+    """Outcome of a single URL fetch (after any Retry-After retries)."""
+
+    def __init__(self, index, url, status=None, text="", headers=None, elapsed=0.0, error=None):
+        self.index = index
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.status == 200
+
+    def attempt_info(self):
+        """Shape used in the sync routes' `fallback_attempts` debug output."""
+        elapsed_ms = round(self.elapsed * 1000, 1)
+        if self.error is not None:
+            return {"url": self.url, "status": "error", "error": self.error, "elapsed_ms": elapsed_ms}
+        return {"url": self.url, "status": self.status, "length": len(self.text), "elapsed_ms": elapsed_ms}
+
+
+class TokenBucket:
+    """Per-host token bucket; `rate` tokens per second up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block_for(self, seconds):
+        """Honour a Retry-After: hand out no tokens until the delay has passed."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def parse_retry_after(value, default=1.0, cap=60.0):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return default
+    try:
+        return min(cap, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return min(cap, max(0.0, (when - datetime.now(timezone.utc)).total_seconds()))
+    except Exception:
+        return default
+
+
+class AsyncFetcher:
+    """
+    Fetch many URLs concurrently with bounded global concurrency and
+    per-host rate limiting.
+    """
+
+    def __init__(self, concurrency=8, per_host_rate=2.0, per_host_burst=4,
+                 timeout=(5, 20), headers=None, max_retries=2, deadline=None, breaker=None):
+        self.concurrency = concurrency
+        self.per_host_rate = per_host_rate
+        self.per_host_burst = per_host_burst
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.breaker = breaker
+        self._buckets = {}
+        self._closed = False
+        self._session = requests.Session()
+        # Own pool rather than asyncio's default executor: asyncio.run() joins
+        # the default one on exit, which would wait out every abandoned fetch
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetch")
+
+    def _bucket(self, url):
+        host = urlparse(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.per_host_rate, self.per_host_burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    def allow(self, url):
+        return self.breaker.allow(url)
+
+    def record(self, url, status=None, error=None):
+        # Fetches abandoned by close() finish in the background; their
+        # outcome says nothing about the host, so it is not counted
+        if not self._closed:
+            self.breaker.record(url, status=status, error=error)
+
+    def _get(self, url):
+        # Outcomes go through self.record() so abandoned fetches can be ignored
+        return guarded_get(url, self.deadline, self if self.breaker is not None else None,
+                           timeout=self.timeout, headers=self.headers, session=self._session)
+
+    async def _fetch_one(self, index, url, semaphore):
+        bucket = self._bucket(url)
+        if self.breaker is not None and not self.breaker.allow(url):
+            # Skip without spending a rate-limit token
+            return FetchResult(index, url, error=f"{CIRCUIT_OPEN} for {urlparse(url).netloc}")
+        # Time on the wire only; waits for rate-limit tokens and slots are excluded
+        elapsed = 0.0
+        attempt = 0
+        transport = get_transport()
+        # Pacing protects the source sites; replays that skip it never reach them
+        paced = transport is None or getattr(transport, "rate_limit", True)
+        while True:
+            if paced:
+                await bucket.acquire()
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    resp = await asyncio.get_running_loop().run_in_executor(self._executor, self._get, url)
+                except Exception as e:
+                    return FetchResult(index, url, elapsed=elapsed + time.monotonic() - started, error=str(e))
+                elapsed += time.monotonic() - started
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = parse_retry_after(resp.headers.get("Retry-After"))
+                # Not worth waiting if the retry could not finish in time
+                if self.deadline is None or delay < self.deadline.remaining():
+                    attempt += 1
+                    bucket.block_for(delay)
+                    continue
+            return FetchResult(
+                index, url,
+                status=resp.status_code,
+                text=resp.text,
+                headers=dict(resp.headers),
+                elapsed=elapsed,
+            )
+
+    async def stream(self, urls):
+        """
+        Async generator yielding FetchResult objects in completion order.
+        Closing the generator early, or reaching the deadline, cancels the
+        fetches still pending.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue = asyncio.Queue()
+
+        async def worker(index, url):
+            await queue.put(await self._fetch_one(index, url, semaphore))
+
+        tasks = [asyncio.create_task(worker(i, u)) for i, u in enumerate(urls)]
+        try:
+            for _ in range(len(tasks)):
+                if self.deadline is None:
+                    yield await queue.get()
+                    continue
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.deadline.remaining())
+                except asyncio.TimeoutError:
+                    # Out of time: stop yielding; the finally below cancels the rest
+                    return
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """
+        Release the fetcher without waiting for requests still on the wire:
+        queued ones are dropped and running ones finish in the background,
+        without reporting to the breaker.
+        """
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+
+
+def fetch_first(urls, parse, **fetcher_kwargs):
+    """
+    Fetch `urls` concurrently and run `parse(result)` on each 200 response as
+    it arrives. Returns (parsed, attempts) as soon as a parse result is
+    non-empty, without waiting for the other fetches (those not yet sent are
+    dropped, in-flight ones are left to finish in the background); parsed is
+    None if none matched.
+    """
+    async def run():
+        fetcher = AsyncFetcher(**fetcher_kwargs)
+        attempts = []
+        try:
+            gen = fetcher.stream(urls)
+            try:
+                async for res in gen:
+                    attempts.append(res.attempt_info())
+                    if res.ok:
+                        parsed = parse(res)
+                        if parsed:
+                            return parsed, attempts
+            finally:
+                await gen.aclose()
+            return None, attempts
+        finally:
+            fetcher.close()
+
+    return asyncio.run(run())
+
+
+def fetch_all(urls, parse, **fetcher_kwargs):
+    """
+    Fetch every URL and parse each 200 response as it arrives.
+    Returns a list of (FetchResult, parsed) in original URL order.
+    """
+    async def run():
+        fetcher = AsyncFetcher(**fetcher_kwargs)
+        out = [None] * len(urls)
+        try:
+            async for res in fetcher.stream(urls):
+                out[res.index] = (res, parse(res) if res.ok else None)
+            # URLs still pending when the deadline hit
+            for i, url in enumerate(urls):
+                if out[i] is None:
+                    out[i] = (FetchResult(i, url, error=DEADLINE_EXCEEDED), None)
+            return out
+        finally:
+            fetcher.close()
+
+    return asyncio.run(run())
@@ -1,9 +1,9 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 import os
 import traceback
 import requests
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 
@@ -23,7 +23,13 @@ def home():
         "endpoints": {
             "draws": "/api/draws",
             "latest": "/api/latest",
+            "export": "/api/draws/export",
+            "search": "/api/search",
+            "analytics": "/api/analytics",
+            "simulate": "/api/simulate",
             "sync": "/api/sync",
+            "backfill": "/api/backfill",
+            "jobs": "/api/jobs/<id>",
             "health": "/api/health"
         }
     })
@@ -44,6 +50,36 @@ def health():
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)}), 500
 
+def warm_up():
+    """
+    Open the worker's pooled DB connections (DB_POOL_SIZE), then serve the
+    hottest read paths once in-process (latest draw, current year) so a
+    fresh worker has its imports, connections and read caches primed before
+    real traffic. Returns {step: (status or connection count, ms)}.
+    """
+    import time
+    from .db import warm_pool
+    timings = {}
+    started = time.perf_counter()
+    idle = warm_pool()
+    timings['db connections'] = (idle, round((time.perf_counter() - started) * 1000, 1))
+    with app.test_client() as client:
+        for path in ('/api/latest', f'/api/draws?year={datetime.now().year}'):
+            started = time.perf_counter()
+            resp = client.get(path)
+            timings[path] = (resp.status_code, round((time.perf_counter() - started) * 1000, 1))
+    return timings
+
+def _render_in_db():
+    """
+    True when read endpoints should pass Postgres-rendered JSON straight
+    through (DRAWS_JSON_RENDER=postgres, or ?render=db per request).
+    """
+    param = (request.args.get('render') or '').lower()
+    if param:
+        return param == 'db'
+    return os.getenv('DRAWS_JSON_RENDER', '').lower() == 'postgres'
+
 @app.route('/api/draws', methods=['GET', 'OPTIONS'])
 def get_draws():
     # Preflight support
@@ -62,6 +98,19 @@ def get_draws():
         except ValueError:
             limit = None
 
+        if _render_in_db():
+            from .db import get_draws_json
+            rendered = get_draws_json(limit=limit, year=year)
+            if rendered is not None:
+                text, count = rendered
+                return Response(f'{{"count": {count}, "data": {text}}}', mimetype='application/json')
+
+        from .snapshot import get_snapshot
+        snap = get_snapshot()
+        if snap is not None:
+            data = snap.draws(limit=limit, year=year)
+            return jsonify({"data": data, "count": len(data)})
+
         draws = db_get_draws(limit=limit, year=year)
         if draws:
             normalized = []
@@ -83,6 +132,21 @@ def latest_draw():
     if request.method == 'OPTIONS':
         return ('', 200)
     try:
+        if _render_in_db():
+            from .db import get_draws_json
+            rendered = get_draws_json(limit=1)
+            if rendered is not None:
+                text, count = rendered
+                if not count:
+                    return jsonify({"error": "No draws available"}), 404
+                # Unwrap the single-element array Postgres rendered
+                return Response(f'{{"data": {text[1:-1]}}}', mimetype='application/json')
+
+        from .snapshot import get_snapshot
+        snap = get_snapshot()
+        if snap is not None:
+            return jsonify({"data": snap.latest()})
+
         from .db import get_latest_draw
         row = get_latest_draw()
         if row:
@@ -96,12 +160,225 @@ def latest_draw():
     except Exception as e:
         return jsonify({"error": "Failed to get latest draw", "detail": str(e), "trace": traceback.format_exc()}), 500
 
+def serialize_draw(row):
+    """Return a JSON-ready copy of a draw row with an ISO draw_date."""
+    d = dict(row)
+    if isinstance(d.get('draw_date'), (datetime,)):
+        d['draw_date'] = d['draw_date'].strftime('%Y-%m-%d')
+    elif d.get('draw_date') and hasattr(d.get('draw_date'), 'isoformat'):
+        d['draw_date'] = d['draw_date'].isoformat()
+    return d
+
+@app.route('/api/draws/export', methods=['GET', 'OPTIONS'])
+def export_draws():
+    """
+    Stream every stored draw without materializing the result set.
+    format=ndjson (default) emits one draw per line; format=json emits the
+    same {"data": [...], "count": N} envelope as /api/draws, written in chunks.
+    format=csv and format=bin return compact date/numbers/stars encodings
+    (layout documented in api/export.py), cached per data version.
+    """
+    # Preflight support
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    from .db import DatabaseUnavailable, iter_draws
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    year_param = request.args.get('year')
+    try:
+        year = int(year_param) if year_param else None
+    except ValueError:
+        year = None
+
+    # The 200 is already sent when a streamed export fails, so the stream
+    # ends with an explicit error record instead of looking complete
+    if fmt == 'ndjson':
+        def generate():
+            count = 0
+            try:
+                for row in iter_draws(year=year):
+                    yield json.dumps(serialize_draw(row), separators=(',', ':')) + "\n"
+                    count += 1
+            except Exception as e:
+                yield json.dumps({"error": "Export interrupted", "detail": str(e), "count": count}) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    if fmt == 'json':
+        def generate():
+            count = 0
+            yield '{"data": ['
+            try:
+                for row in iter_draws(year=year):
+                    if count:
+                        yield ','
+                    yield json.dumps(serialize_draw(row), separators=(',', ':'))
+                    count += 1
+            except Exception as e:
+                error = json.dumps({"error": "Export interrupted", "detail": str(e)})
+                yield f'], "count": {count}, ' + error[1:]
+                return
+            yield f'], "count": {count}}}'
+        return Response(generate(), mimetype='application/json')
+
+    if fmt in ('csv', 'bin'):
+        from .db import get_data_version
+        from .export import get_export, RECORD_SIZE, DTYPE_HEADER
+        version = get_data_version()
+        etag = f"{fmt}-{year or 'all'}-{version}"
+        if version is not None and etag in request.if_none_match:
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        try:
+            payload = get_export(fmt, version, lambda: iter_draws(year=year), year=year)
+        except DatabaseUnavailable:
+            return jsonify({"error": "Database unavailable"}), 503
+        except Exception as e:
+            return jsonify({"error": "Export failed", "detail": str(e), "trace": traceback.format_exc()}), 500
+        if fmt == 'csv':
+            resp = Response(payload, mimetype='text/csv')
+        else:
+            resp = Response(payload, mimetype='application/octet-stream')
+            resp.headers["X-Record-Size"] = str(RECORD_SIZE)
+            resp.headers["X-Record-Dtype"] = DTYPE_HEADER
+        if version is not None:
+            resp.headers["ETag"] = f'"{etag}"'
+        return resp
+
+    return jsonify({"error": "Unsupported format. Use ndjson, json, csv or bin"}), 400
+
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+
+def _parse_number_list(name, low, high):
+    """Parse a comma-separated query arg like `7,19` into a list of ints in [low, high]."""
+    raw = request.args.get(name) or ''
+    values = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        n = int(part)
+        if not low <= n <= high:
+            raise ValueError(f"{name} values must be between {low} and {high}")
+        values.append(n)
+    return sorted(set(values))
+
+@app.route('/api/search', methods=['GET', 'OPTIONS'])
+def search_draws():
+    """
+    Draws containing all of `numbers`/`stars` and none of
+    `exclude_numbers`/`exclude_stars` (comma-separated), optionally within
+    `start`/`end` (YYYY-MM-DD), newest first. Pages with `limit` and the
+    `next_before` cursor returned by the previous page.
+    """
+    # Preflight support
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    try:
+        numbers = _parse_number_list('numbers', 1, 50)
+        stars = _parse_number_list('stars', 1, 12)
+        exclude_numbers = _parse_number_list('exclude_numbers', 1, 50)
+        exclude_stars = _parse_number_list('exclude_stars', 1, 12)
+        dates = {}
+        for name in ('start', 'end', 'before'):
+            value = request.args.get(name)
+            dates[name] = datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        limit_param = request.args.get('limit')
+        limit = int(limit_param) if limit_param else SEARCH_DEFAULT_LIMIT
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    except ValueError as e:
+        return jsonify({"error": "Invalid search parameters", "detail": str(e)}), 400
+
+    try:
+        from .db import search_draws as db_search_draws
+        # Fetch one extra row to know whether another page exists
+        rows = db_search_draws(
+            numbers=numbers, stars=stars,
+            exclude_numbers=exclude_numbers, exclude_stars=exclude_stars,
+            start=dates['start'], end=dates['end'], before=dates['before'],
+            limit=limit + 1,
+        )
+        data = [serialize_draw(r) for r in rows[:limit]]
+        next_before = data[-1]['draw_date'] if len(rows) > limit else None
+        return jsonify({"data": data, "count": len(data), "next_before": next_before})
+    except Exception as e:
+        return jsonify({"error": "Failed to search draws", "detail": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route('/api/analytics', methods=['GET', 'OPTIONS'])
+def analytics():
+    """Sum, odd/even, low/high, consecutive, decade and star-pair distributions."""
+    # Preflight support
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    try:
+        from .analytics import get_analytics
+        result = get_analytics()
+        if result is None:
+            return jsonify({"error": "No draws available"}), 404
+        return jsonify({"data": result})
+    except Exception as e:
+        return jsonify({"error": "Failed to compute analytics", "detail": str(e), "trace": traceback.format_exc()}), 500
+
+SIMULATION_MAX_TICKETS_PER_DRAW = 10000
+
+@app.route('/api/simulate', methods=['GET', 'OPTIONS'])
+def simulate():
+    """
+    Replay ticket-picking strategies against the stored history (see
+    api/simulate.py). Runs in-process unless SIMULATION_WORKERS > 1, and stops
+    after SIMULATION_CPU_BUDGET seconds of CPU (default 10).
+    """
+    # Preflight support
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    from .simulate import MAX_AVOID, STRATEGIES
+    try:
+        strategies = [s.strip() for s in (request.args.get('strategies') or ','.join(STRATEGIES)).split(',') if s.strip()]
+        unknown = [s for s in strategies if s not in STRATEGIES]
+        if unknown:
+            raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+        tickets_per_draw = int(request.args.get('tickets_per_draw') or 1000)
+        if not 1 <= tickets_per_draw <= SIMULATION_MAX_TICKETS_PER_DRAW:
+            raise ValueError(f"tickets_per_draw must be between 1 and {SIMULATION_MAX_TICKETS_PER_DRAW}")
+        seed = int(request.args.get('seed') or 0)
+        window = max(1, int(request.args.get('window') or 50))
+        avoid = int(request.args.get('avoid') or 2)
+        if not 0 <= avoid <= MAX_AVOID:
+            raise ValueError(f"avoid must be between 0 and {MAX_AVOID}")
+        since = request.args.get('since')
+        if since:
+            since = datetime.strptime(since, '%Y-%m-%d').strftime('%Y-%m-%d')
+        max_budget = float(os.getenv('SIMULATION_CPU_BUDGET', '10'))
+        cpu_budget = min(float(request.args.get('cpu_budget') or max_budget), max_budget)
+    except ValueError as e:
+        return jsonify({"error": "Invalid simulation parameters", "detail": str(e)}), 400
+
+    try:
+        from .db import iter_draws
+        from .simulate import run_simulation
+        report = run_simulation(
+            list(iter_draws()),
+            strategies=strategies,
+            tickets_per_draw=tickets_per_draw,
+            seed=seed,
+            workers=int(os.getenv('SIMULATION_WORKERS', '1')),
+            cpu_budget=cpu_budget,
+            window=window,
+            avoid=avoid,
+            since=since,
+        )
+        return jsonify({"data": report})
+    except Exception as e:
+        return jsonify({"error": "Simulation failed", "detail": str(e), "trace": traceback.format_exc()}), 500
+
 
 
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
 import json
+from contextlib import contextmanager
+from .fetcher import CIRCUIT_OPEN, DEADLINE_EXCEEDED, CircuitBreaker, Deadline, fetch_first, guarded_get
+from .parse_cache import cache_stats, memoized_parse, upsert_if_changed
 
+@memoized_parse
 def parse_draw_from_page(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
 
@@ -350,12 +627,18 @@ def parse_draw_from_page(html_content):
         "winners": None
     }
 
+@memoized_parse
 def parse_draw_for_date(html_content, target_date_str, collect_debug: bool = False):
     """
     Parse a specific EuroMillions draw for the given ISO date (YYYY-MM-DD)
     from a results page that contains multiple draws.
+    Accepts raw HTML or an already-parsed BeautifulSoup document, so an archive
+    can be parsed once and searched for many dates.
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    if isinstance(html_content, BeautifulSoup):
+        soup = html_content
+    else:
+        soup = BeautifulSoup(html_content, 'html.parser')
     try:
         dt = datetime.strptime(target_date_str, '%Y-%m-%d')
     except Exception:
@@ -710,6 +993,7 @@ def parse_draw_for_date(html_content, target_date_str, collect_debug: bool = Fal
         result["debug"] = provenance
     return result
 
+@memoized_parse
 def parse_draw_detail_page(html_content, target_date_str, collect_debug: bool = False):
     """
     Parse a single-draw detail page where only one EuroMillions draw is present.
@@ -1020,16 +1304,268 @@ def parse_draw_detail_page(html_content, target_date_str, collect_debug: bool =
         result["debug"] = provenance
     return result
 
+# Fallback fetches run concurrently; keep the window small so a single sync
+# does not fire the whole candidate list at the source sites at once.
+FALLBACK_CONCURRENCY = 4
+
+def fallback_candidates(source_url, target_date):
+    """
+    Build the ordered list of detail/archive URLs to try for a draw date,
+    always covering euro-millions.com and euromillones.com besides the source host.
+    """
+    p = urlparse(source_url)
+    base = f"{p.scheme}://{p.netloc}"
+    date_dash = datetime.strptime(target_date, '%Y-%m-%d').strftime('%d-%m-%Y')
+    year = datetime.strptime(target_date, '%Y-%m-%d').strftime('%Y')
+
+    # Build fallbacks, always prioritizing euro-millions.com first
+    bases = []
+    euro_millions = f"{p.scheme}://www.euro-millions.com"
+    euromillones = f"{p.scheme}://www.euromillones.com"
+    # Preferred order
+    bases.append(euro_millions)
+    bases.append(euromillones)
+    # Include the original base to cover other variants
+    if base not in bases:
+        bases.insert(0, base)
+    # Deduplicate while preserving order
+    seen = set()
+    bases = [b for b in bases if not (b in seen or seen.add(b))]
+
+    candidates = []
+    for b in bases:
+        # Detail pages
+        candidates.append(urljoin(b, f"/en/results/euromillions/{target_date}"))
+        candidates.append(urljoin(b, f"/en/results/euromillions/{date_dash}"))
+        candidates.append(urljoin(b, f"/results/euromillions/{target_date}"))
+        candidates.append(urljoin(b, f"/results/euromillions/{date_dash}"))
+        # euro-millions.com uses /results/<dd-mm-yyyy>
+        candidates.append(urljoin(b, f"/results/{target_date}"))
+        candidates.append(urljoin(b, f"/results/{date_dash}"))
+        # amp pages (simpler markup)
+        candidates.append(urljoin(b, f"/amp/results/{target_date}"))
+        candidates.append(urljoin(b, f"/amp/results/{date_dash}"))
+        # Year archive page on euro-millions.com
+        candidates.append(urljoin(b, f"/results-history-{year}"))
+    return candidates
+
+# Latency assumed for a URL pattern with no recorded attempts
+PATTERN_PRIOR_MS = 1000.0
+
+def candidate_pattern(url, target_date):
+    """(host, path template) of a fallback URL, e.g. ('www.euro-millions.com', '/results/{dd-mm-yyyy}')."""
+    p = urlparse(url)
+    date_dash = datetime.strptime(target_date, '%Y-%m-%d').strftime('%d-%m-%Y')
+    path = p.path.replace(target_date, '{date}').replace(date_dash, '{dd-mm-yyyy}').replace(target_date[:4], '{year}')
+    return p.netloc, path
+
+def pattern_score(stat):
+    """
+    Expected milliseconds until a successful parse for a URL pattern: the
+    smoothed mean latency divided by the smoothed success rate. Patterns with
+    no history score as a 50% success rate at PATTERN_PRIOR_MS.
+    """
+    attempts = stat.get("attempts", 0)
+    rate = (stat.get("successes", 0) + 1) / (attempts + 2)
+    mean_ms = (stat.get("total_ms", 0) + PATTERN_PRIOR_MS) / (attempts + 1)
+    return mean_ms / rate, rate, mean_ms
+
+def rank_candidates(urls, target_date, stats):
+    """
+    Reorder fallback URLs by learned pattern score, cheapest first; ties keep
+    the built-in order. Returns (urls, ranking) where ranking is debug output.
+    """
+    ranking = []
+    for url in urls:
+        host, pattern = candidate_pattern(url, target_date)
+        stat = stats.get((host, pattern)) or {}
+        score, rate, mean_ms = pattern_score(stat)
+        ranking.append({
+            "url": url,
+            "pattern": pattern,
+            "attempts": stat.get("attempts", 0),
+            "success_rate": round(rate, 3),
+            "mean_ms": round(mean_ms, 1),
+            "score": round(score, 1),
+        })
+    ranking.sort(key=lambda r: r["score"])
+    return [r["url"] for r in ranking], ranking
+
+def pattern_outcome(attempt, target_date, succeeded):
+    """(host, pattern, succeeded, elapsed_ms) for record_pattern_stats, or None for fetches that never ran."""
+    error = attempt.get("error") or ""
+    if error.startswith((CIRCUIT_OPEN, DEADLINE_EXCEEDED)):
+        return None
+    host, pattern = candidate_pattern(attempt["url"], target_date)
+    return host, pattern, succeeded, attempt.get("elapsed_ms", 0)
+
+def fetch_first_candidate(source_url, target_date, parse, guard, **fetch_kwargs):
+    """
+    fetch_first() over the fallback candidates in learned order, recording
+    each attempt's outcome. Returns (draw, attempts, ranking).
+    """
+    from .db import load_pattern_stats, record_pattern_stats
+    candidates, ranking = rank_candidates(fallback_candidates(source_url, target_date), target_date, load_pattern_stats())
+    draw, tried = fetch_first(candidates, parse, concurrency=FALLBACK_CONCURRENCY, **fetch_kwargs, **guard)
+    # fetch_first stops right after the attempt that parsed
+    winner = tried[-1]["url"] if draw and tried else None
+    outcomes = [pattern_outcome(a, target_date, a["url"] == winner) for a in tried]
+    record_pattern_stats([o for o in outcomes if o])
+    return draw, tried, ranking
+
+def parse_candidate_page(url, html_content, target_date, collect_debug: bool = False):
+    """Parse a fetched fallback page with the parser matching its URL shape."""
+    year = target_date[:4]
+    if f"/results-history-{year}" in url:
+        # Multi-draw archive page: parse using target date
+        return parse_draw_for_date(html_content, target_date, collect_debug=collect_debug)
+    return parse_draw_detail_page(html_content, target_date, collect_debug=collect_debug)
+
+# Every fetch in one sync run must finish within this many seconds
+SYNC_DEADLINE_SECONDS = float(os.getenv('SYNC_DEADLINE_SECONDS', '25'))
+
+@contextmanager
+def fetch_guard():
+    """
+    Deadline and per-host circuit breaker shared by every fetch of one sync
+    run, as kwargs for guarded_get/fetch_first/fetch_all. Breaker state is
+    loaded from fetch_host_health on first use and saved when the run ends.
+    """
+    from .db import load_host_health, save_host_health
+    breaker = CircuitBreaker(loader=load_host_health)
+    try:
+        yield {"deadline": Deadline(SYNC_DEADLINE_SECONDS), "breaker": breaker}
+    finally:
+        if breaker.dirty:
+            save_host_health(breaker.changed())
+
+def guard_info(guard):
+    """Deadline/circuit state for debug output."""
+    return {
+        "deadline_seconds": guard["deadline"].seconds,
+        "deadline_exceeded": guard["deadline"].expired,
+        "open_circuits": guard["breaker"].open_hosts(),
+    }
+
+def run_sync(fn, *args, **kwargs):
+    """
+    Run a sync view body with every read pinned to the primary, so it sees
+    its own writes, without holding a transaction open. Fetching and parsing
+    happen first; the DB writes get their own short unit of work
+    (write_draws), whose round trips are reported in X-DB-Round-Trips.
+    """
+    from flask import g, make_response
+    from .db import primary_reads
+    with primary_reads():
+        resp = make_response(fn(*args, **kwargs))
+    round_trips = g.pop("db_round_trips", None)
+    if round_trips is not None:
+        resp.headers["X-DB-Round-Trips"] = str(round_trips)
+        print(f"{request.path}: {round_trips} DB round trips", flush=True)
+    return resp
+
+def write_draws(draws):
+    """
+    Upsert draws in one unit of work, all or nothing. Returns (changes, None)
+    with one INSERTED/UPDATED/UNCHANGED per draw, or ([], error) when any
+    upsert or the commit failed, in which case nothing was saved.
+    """
+    from flask import g
+    from .db import unit_of_work
+    changes = []
+    uow = None
+    try:
+        with unit_of_work() as uow:
+            for draw in draws:
+                change = upsert_if_changed(draw)
+                if not change:
+                    uow.failed = True
+                    break
+                changes.append(change)
+    except Exception as e:
+        return [], f"Commit failed: {e}"
+    finally:
+        if uow is not None:
+            g.db_round_trips = uow.round_trips
+    if uow.failed:
+        return [], f"Upsert failed for {draws[len(changes)].get('draw_date')}"
+    return changes, None
+
+# Sync endpoints enqueue a job for api/worker.py instead of scraping inline
+# when SYNC_QUEUE is set or the request passes ?mode=queue
+SYNC_QUEUE = str(os.getenv('SYNC_QUEUE') or '').lower() in ('1', 'true', 'yes', 'on')
+
+def queue_requested():
+    mode = str(request.args.get('mode') or '').lower()
+    if mode == 'inline':
+        return False
+    return SYNC_QUEUE or mode == 'queue'
+
+def enqueue_sync(kind, target_date, params):
+    """202 with the job id (existing one if that date is already queued or running)."""
+    from .db import enqueue_sync_job
+    queued = enqueue_sync_job(kind, target_date, params)
+    if not queued:
+        return jsonify({"error": "Job queue unavailable (requires DATABASE_URL)"}), 503
+    job_id, created = queued
+    return jsonify({
+        "job_id": job_id,
+        "created": created,
+        "status_url": f"/api/jobs/{job_id}",
+    }), 202
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET', 'OPTIONS'])
+def get_job(job_id):
+    if request.method == 'OPTIONS':
+        return ('', 200)
+    try:
+        from .db import get_sync_job
+        job = get_sync_job(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({"error": "Failed to get job", "detail": str(e), "trace": traceback.format_exc()}), 500
+
 @app.route('/api/sync', methods=['GET', 'POST'])
 def sync_latest():
+    force = str(request.args.get('force') or '').lower() in ('1', 'true', 'yes', 'on')
+    if queue_requested():
+        from .draw_calendar import expected_latest_draw
+        return enqueue_sync('latest', expected_latest_draw().isoformat(), {"force": force})
+    return run_sync(run_sync_latest, force=force)
+
+def run_sync_latest(force=False):
+    """Scrape the latest draw from EURO_SOURCE_URL and upsert it."""
+    with fetch_guard() as guard:
+        return _sync_latest(force, guard)
+
+def _sync_latest(force, guard):
     try:
-        from .db import ensure_schema, upsert_draw
+        from .db import ensure_schema, get_latest_draw
+        from .draw_calendar import expected_latest_draw
+
+        # Skip the scrape entirely when the newest published draw is already stored
+        expected = expected_latest_draw()
+        if not force and expected:
+            latest = get_latest_draw()
+            stored = serialize_draw(latest).get('draw_date') if latest else None
+            if stored and stored >= expected.isoformat():
+                return jsonify({
+                    "status": "ok",
+                    "skipped": True,
+                    "reason": "Latest expected draw already stored",
+                    "expected": expected.isoformat(),
+                    "latest_stored": stored,
+                })
+
         ensure_schema()
 
         source_url = os.getenv("EURO_SOURCE_URL", "https://www.euro-millions.com/results")
         try:
             headers = {"Accept": "text/html"}
-            resp = requests.get(source_url, timeout=15, headers=headers)
+            # Always tried: a circuit opened by fallback fetches must not block the source page
+            resp = guarded_get(source_url, timeout=15, headers=headers, bypass_circuit=True, **guard)
             resp.raise_for_status()
             draw = parse_draw_from_page(resp.text)
         except Exception as e:
@@ -1075,49 +1611,12 @@ def sync_latest():
 
             if target_date:
                 # Attempt per-draw detail/archive fallbacks like /api/sync_date
-                p = urlparse(source_url)
-                base = f"{p.scheme}://{p.netloc}"
-                year = datetime.strptime(target_date, '%Y-%m-%d').strftime('%Y')
-                date_dash = datetime.strptime(target_date, '%Y-%m-%d').strftime('%d-%m-%Y')
-
-                bases = []
-                euro_millions = f"{p.scheme}://www.euro-millions.com"
-                euromillones = f"{p.scheme}://www.euromillones.com"
-                bases.append(euro_millions)
-                bases.append(euromillones)
-                if base not in bases:
-                    bases.insert(0, base)
-                seen = set()
-                bases = [b for b in bases if not (b in seen or seen.add(b))]
-
-                candidates = []
-                for b in bases:
-                    candidates.append(urljoin(b, f"/en/results/euromillions/{target_date}"))
-                    candidates.append(urljoin(b, f"/en/results/euromillions/{date_dash}"))
-                    candidates.append(urljoin(b, f"/results/euromillions/{target_date}"))
-                    candidates.append(urljoin(b, f"/results/euromillions/{date_dash}"))
-                    candidates.append(urljoin(b, f"/results/{target_date}"))
-                    candidates.append(urljoin(b, f"/results/{date_dash}"))
-                    candidates.append(urljoin(b, f"/amp/results/{target_date}"))
-                    candidates.append(urljoin(b, f"/amp/results/{date_dash}"))
-                    candidates.append(urljoin(b, f"/results-history-{year}"))
-
-                tried = []
-                for url in candidates:
-                    try:
-                        r2 = requests.get(url, timeout=(5, 20), headers={"Accept": "text/html"})
-                        tried.append({"url": url, "status": r2.status_code, "length": len(r2.text)})
-                        if r2.status_code == 200:
-                            if f"/results-history-{year}" in url:
-                                # Multi-draw archive page: parse using target date
-                                d2 = parse_draw_for_date(r2.text, target_date, collect_debug=False)
-                            else:
-                                d2 = parse_draw_detail_page(r2.text, target_date, collect_debug=False)
-                            if d2:
-                                draw = d2
-                                break
-                    except Exception as e:
-                        tried.append({"url": url, "status": "error", "error": str(e)})
+                draw, tried, ranking = fetch_first_candidate(
+                    source_url, target_date,
+                    lambda res: parse_candidate_page(res.url, res.text, target_date),
+                    guard,
+                    headers={"Accept": "text/html"},
+                )
 
                 if not draw:
                     return jsonify({
@@ -1126,7 +1625,9 @@ def sync_latest():
                         "derived_date": target_date,
                         "html_preview": resp.text[:800] + "..." if len(resp.text) > 800 else resp.text,
                         "html_length": len(resp.text),
-                        "fallback_attempts": tried
+                        "fallback_attempts": tried,
+                        "candidate_ranking": ranking,
+                        **guard_info(guard),
                     }), 422
             else:
                 # Could not derive a target date; return debug info
@@ -1139,31 +1640,41 @@ def sync_latest():
                 }
                 return jsonify(debug_info), 422
 
-        ok = upsert_draw(draw)
-        if not ok:
-            return jsonify({"error": "Failed to persist draw"}), 500
+        changes, error = write_draws([draw])
+        if error:
+            return jsonify({"error": "Failed to persist draw", "detail": error}), 500
+        change = changes[0]
 
-        return jsonify({"status": "ok", "upserted": draw.get("draw_date"), "parsed": draw})
+        return jsonify({"status": "ok", "upserted": draw.get("draw_date"), "change": change, "parsed": draw})
     except Exception as e:
         return jsonify({"error": "Sync failed", "detail": str(e), "trace": traceback.format_exc()}), 500
 
 @app.route('/api/sync_date')
 def sync_date():
     """Sync a specific draw date using the multi-draw results page."""
+    target_date = request.args.get('date')
+    debug_flag = request.args.get('debug')
+    collect_debug = str(debug_flag or '').lower() in ('1', 'true', 'yes', 'on')
+    if not target_date:
+        return jsonify({"error": "Missing required query param 'date' (YYYY-MM-DD)"}), 400
+    # Validate date format
     try:
-        from .db import ensure_schema, upsert_draw
-        ensure_schema()
+        datetime.strptime(target_date, '%Y-%m-%d')
+    except Exception:
+        return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+    if queue_requested():
+        return enqueue_sync('date', target_date, {"debug": collect_debug})
+    return run_sync(run_sync_date, target_date, collect_debug=collect_debug)
 
-        target_date = request.args.get('date')
-        debug_flag = request.args.get('debug')
-        collect_debug = str(debug_flag or '').lower() in ('1', 'true', 'yes', 'on')
-        if not target_date:
-            return jsonify({"error": "Missing required query param 'date' (YYYY-MM-DD)"}), 400
-        # Validate date format
-        try:
-            datetime.strptime(target_date, '%Y-%m-%d')
-        except Exception:
-            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+def run_sync_date(target_date, collect_debug: bool = False):
+    """Scrape the draw for target_date (YYYY-MM-DD) and upsert it."""
+    with fetch_guard() as guard:
+        return _sync_date(target_date, collect_debug, guard)
+
+def _sync_date(target_date, collect_debug, guard):
+    try:
+        from .db import ensure_schema
+        ensure_schema()
 
         source_url = os.getenv("EURO_SOURCE_URL", "https://www.euro-millions.com/results")
         headers = {
@@ -1175,88 +1686,167 @@ def sync_date():
         resp = None
         draw = None
         try:
-            resp = requests.get(source_url, timeout=(5, 20), headers=headers)
+            # Always tried: a circuit opened by fallback fetches must not block the source page
+            resp = guarded_get(source_url, timeout=(5, 20), headers=headers, bypass_circuit=True, **guard)
             resp.raise_for_status()
             draw = parse_draw_for_date(resp.text, target_date, collect_debug=collect_debug)
         except Exception as e:
             # Don't fail hard here; proceed to fallbacks
             primary_fetch_error = str(e)
 
+        ranking = None
         if not draw:
-            # Attempt per-draw detail page fallbacks based on the source host
-            p = urlparse(source_url)
-            base = f"{p.scheme}://{p.netloc}"
-            date_dash = datetime.strptime(target_date, '%Y-%m-%d').strftime('%d-%m-%Y')
-            year = datetime.strptime(target_date, '%Y-%m-%d').strftime('%Y')
-
-            # Build fallbacks, always prioritizing euro-millions.com first
-            bases = []
-            euro_millions = f"{p.scheme}://www.euro-millions.com"
-            euromillones = f"{p.scheme}://www.euromillones.com"
-            # Preferred order
-            bases.append(euro_millions)
-            bases.append(euromillones)
-            # Include the original base to cover other variants
-            if base not in bases:
-                bases.insert(0, base)
-            # Deduplicate while preserving order
-            seen = set()
-            bases = [b for b in bases if not (b in seen or seen.add(b))]
-
-            candidates = []
-            for b in bases:
-                # Detail pages
-                candidates.append(urljoin(b, f"/en/results/euromillions/{target_date}"))
-                candidates.append(urljoin(b, f"/en/results/euromillions/{date_dash}"))
-                candidates.append(urljoin(b, f"/results/euromillions/{target_date}"))
-                candidates.append(urljoin(b, f"/results/euromillions/{date_dash}"))
-                # euro-millions.com uses /results/<dd-mm-yyyy>
-                candidates.append(urljoin(b, f"/results/{target_date}"))
-                candidates.append(urljoin(b, f"/results/{date_dash}"))
-                # amp pages (simpler markup)
-                candidates.append(urljoin(b, f"/amp/results/{target_date}"))
-                candidates.append(urljoin(b, f"/amp/results/{date_dash}"))
-                # Year archive page on euro-millions.com
-                candidates.append(urljoin(b, f"/results-history-{year}"))
-
-            tried = []
-            archive_text = None
-            for url in candidates:
-                try:
-                    r2 = requests.get(url, timeout=(5, 20), headers=headers)
-                    tried.append({"url": url, "status": r2.status_code, "length": len(r2.text)})
-                    if r2.status_code == 200:
-                        if f"/results-history-{year}" in url:
-                            # Multi-draw archive page: try date-scoped parser
-                            archive_text = r2.text
-                            d2 = parse_draw_for_date(r2.text, target_date, collect_debug=collect_debug)
-                        else:
-                            d2 = parse_draw_detail_page(r2.text, target_date, collect_debug=collect_debug)
-                        if d2:
-                            draw = d2
-                            break
-                except Exception as e:
-                    tried.append({"url": url, "status": "error", "error": str(e)})
+            # Attempt per-draw detail page fallbacks, most promising URL pattern first
+            draw, tried, ranking = fetch_first_candidate(
+                source_url, target_date,
+                lambda res: parse_candidate_page(res.url, res.text, target_date, collect_debug=collect_debug),
+                guard,
+                headers=headers,
+            )
 
             if not draw:
                 # Enhanced debugging information
-                time_tags = re.findall(r'<time[^>]*datetime="(.*?)"', resp.text[:50000], flags=re.I)
+                html = resp.text if resp is not None else ""
+                time_tags = re.findall(r'<time[^>]*datetime="(.*?)"', html[:50000], flags=re.I)
                 return jsonify({
                     "error": "Could not parse target draw from page",
                     "date": target_date,
                     "url": source_url,
-                    "html_preview": resp.text[:800] + "..." if len(resp.text) > 800 else resp.text,
-                    "html_length": len(resp.text),
+                    "html_preview": html[:800] + "..." if len(html) > 800 else html,
+                    "html_length": len(html),
                     "time_tags_found": time_tags[:10],
                     "fallback_attempts": tried,
                     "archive_hint": True,
-                    "primary_fetch_error": primary_fetch_error
+                    "primary_fetch_error": primary_fetch_error,
+                    "candidate_ranking": ranking,
+                    **guard_info(guard),
                 }), 422
 
-        ok = upsert_draw(draw)
-        if not ok:
-            return jsonify({"error": "Failed to persist draw"}), 500
-
-        return jsonify({"status": "ok", "upserted": draw.get("draw_date"), "parsed": draw})
+        changes, error = write_draws([draw])
+        if error:
+            return jsonify({"error": "Failed to persist draw", "detail": error}), 500
+        change = changes[0]
+
+        result = {"status": "ok", "upserted": draw.get("draw_date"), "change": change, "parsed": draw}
+        if collect_debug:
+            result["parse_cache"] = cache_stats()
+            if ranking is not None:
+                result["candidate_ranking"] = ranking
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": "Sync date failed", "detail": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route('/api/backfill')
+def backfill():
+    """
+    Find stored-draw gaps in a date range and fill them from year archives.
+    Query params: start/end (YYYY-MM-DD) or days (default 60, counted back
+    from the latest published draw). Each year archive is fetched once.
+    """
+    return run_sync(run_backfill)
+
+def run_backfill():
+    with fetch_guard() as guard:
+        return _backfill(guard)
+
+def _backfill(guard):
+    try:
+        from .db import ensure_schema, missing_draw_dates, load_pattern_stats, record_pattern_stats
+        from .draw_calendar import draw_dates_between, expected_latest_draw
+        from .fetcher import fetch_all
+
+        try:
+            end_param = request.args.get('end')
+            end = datetime.strptime(end_param, '%Y-%m-%d').date() if end_param else expected_latest_draw()
+            start_param = request.args.get('start')
+            if start_param:
+                start = datetime.strptime(start_param, '%Y-%m-%d').date()
+            else:
+                start = end - timedelta(days=int(request.args.get('days') or 60))
+        except ValueError:
+            return jsonify({"error": "Invalid range. Use start/end as YYYY-MM-DD or an integer days"}), 400
+
+        expected = draw_dates_between(start, end)
+        ensure_schema()
+        missing = missing_draw_dates(expected)
+        if missing is None:
+            return jsonify({"error": "Database unavailable"}), 503
+
+        summary = {
+            "status": "ok",
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "expected": len(expected),
+            "missing": [d.isoformat() for d in missing],
+            "filled": [],
+            "changes": {},
+            "unresolved": [],
+            "archive_attempts": [],
+        }
+        if not missing:
+            return jsonify(summary)
+
+        # Group missing dates by year so each archive is fetched (and parsed) once
+        by_year = {}
+        for d in missing:
+            by_year.setdefault(d.year, []).append(d.isoformat())
+
+        source_url = os.getenv("EURO_SOURCE_URL", "https://www.euro-millions.com/results")
+        # Archive URLs per year (one per base host), best-scoring host first
+        stats = load_pattern_stats()
+        archives = {
+            year: rank_candidates(
+                [u for u in fallback_candidates(source_url, dates[0]) if f"/results-history-{year}" in u],
+                dates[0], stats,
+            )[0]
+            for year, dates in by_year.items()
+        }
+
+        def parse_archive(res):
+            year = int(res.url.rsplit('-', 1)[-1])
+            soup = BeautifulSoup(res.text, 'html.parser')
+            found = {}
+            for target in by_year[year]:
+                d = parse_draw_for_date(soup, target)
+                if d:
+                    found[target] = d
+            return found
+
+        found = {}
+        outcomes = []
+        pending = sorted(by_year)
+        rounds = max(len(urls) for urls in archives.values())
+        for i in range(rounds):
+            # Try the next archive host only for years that still have gaps
+            urls = [archives[y][i] for y in pending if i < len(archives[y])]
+            if not urls:
+                break
+            for res, parsed in fetch_all(urls, parse_archive, concurrency=FALLBACK_CONCURRENCY, **guard):
+                attempt = res.attempt_info()
+                summary["archive_attempts"].append(attempt)
+                found.update(parsed or {})
+                year = int(res.url.rsplit('-', 1)[-1])
+                outcomes.append(pattern_outcome(attempt, by_year[year][0], bool(parsed)))
+            pending = [y for y in pending if any(t not in found for t in by_year[y])]
+            if not pending:
+                break
+        record_pattern_stats([o for o in outcomes if o])
+
+        # Every archive is fetched and parsed before the write transaction opens
+        keys = [d.isoformat() for d in missing if d.isoformat() in found]
+        changes, error = write_draws([found[k] for k in keys])
+        if error:
+            return jsonify({
+                "error": "Failed to persist backfilled draws; nothing was saved",
+                "detail": error,
+                "missing": summary["missing"],
+                **guard_info(guard),
+            }), 500
+        summary["filled"] = keys
+        summary["changes"] = dict(zip(keys, changes))
+        summary["unresolved"] = [d.isoformat() for d in missing if d.isoformat() not in found]
+
+        summary.update(guard_info(guard))
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({"error": "Backfill failed", "detail": str(e), "trace": traceback.format_exc()}), 500
@@ -0,0 +1,206 @@
+"""
+Record/replay transport for the sync routes' HTTP fetches.
+
+Every upstream GET made by the sync code goes through fetcher.guarded_get(),
+which hands the request to the installed transport:
+
+- Recorder(path) performs the real request and appends the request URL and
+  headers, response status, headers, body and latency (or the exception
+  raised) to a fixture bundle, rewritten after every response.
+- Replayer(path, latency=0.0) serves responses from a bundle without touching
+  the network. Repeated requests for a URL get its recordings in order, the
+  last one repeating. Unrecorded URLs (candidates the live run never got to,
+  or reordered since) get an empty 404 that guarded_get() does not report to
+  the circuit breaker, so they neither stop the run nor trip a host and the
+  replay moves on to the next candidate as a live run would. With latency > 0
+  each response is delayed by that multiple of its recorded latency, and a
+  delay longer than the request's timeout raises Timeout instead, so deadline
+  and fallback behaviour can be reproduced. Per-host rate limiting is skipped
+  unless latency > 0 (or rate_limit=True), since no host is contacted.
+
+Set FETCH_RECORD=<bundle> or FETCH_REPLAY=<bundle> (plus
+FETCH_REPLAY_LATENCY) to pick one for the whole process, or install one with
+fetcher.set_transport(). Bundles are JSON, gzipped when the path ends in .gz.
+Record with a single process; concurrent recorders overwrite each other.
+"""
+import base64
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+BUNDLE_VERSION = 1
+
+# Decoded by requests already; replaying them would mislabel the stored body
+_DROP_HEADERS = ("content-encoding", "transfer-encoding", "content-length")
+
+
+def load_bundle(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        bundle = json.load(f)
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported fixture bundle version {bundle.get('version')!r} in {path}")
+    return bundle
+
+
+def save_bundle(path, bundle):
+    """Write atomically so a crash mid-write never leaves a truncated bundle."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".bundle-")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            f = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) if path.endswith(".gz") else raw
+            f.write(json.dumps(bundle, indent=1).encode("utf-8"))
+            if f is not raw:
+                f.close()
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+def _limit(timeout):
+    if timeout is None:
+        return None
+    if isinstance(timeout, (tuple, list)):
+        return sum(t for t in timeout if t is not None)
+    return timeout
+
+
+class Recorder:
+    """Transport that fetches for real and records each exchange."""
+
+    rate_limit = True
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self.bundle = load_bundle(path)
+        else:
+            self.bundle = {
+                "version": BUNDLE_VERSION,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "entries": [],
+            }
+
+    def get(self, url, timeout=None, headers=None, session=None):
+        entry = {"url": url, "request_headers": dict(headers or {})}
+        started = time.monotonic()
+        try:
+            resp = (session or requests).get(url, timeout=timeout, headers=headers)
+        except Exception as e:
+            entry["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+            entry["error"] = type(e).__name__
+            entry["message"] = str(e)
+            self._append(entry)
+            raise
+        entry["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        entry["final_url"] = resp.url
+        entry["status"] = resp.status_code
+        entry["reason"] = resp.reason
+        entry["headers"] = {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_HEADERS}
+        entry["encoding"] = resp.encoding
+        try:
+            entry["body"] = resp.content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(resp.content).decode("ascii")
+        self._append(entry)
+        return resp
+
+    def _append(self, entry):
+        with self._lock:
+            self.bundle["entries"].append(entry)
+            save_bundle(self.path, self.bundle)
+
+
+class Replayer:
+    """Transport that answers from a recorded bundle."""
+
+    def __init__(self, path, latency=0.0, rate_limit=None):
+        self.path = path
+        self.latency = float(latency)
+        self.rate_limit = self.latency > 0 if rate_limit is None else rate_limit
+        self.recordings = {}
+        for entry in load_bundle(path)["entries"]:
+            self.recordings.setdefault(entry["url"], []).append(entry)
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def _next(self, url):
+        with self._lock:
+            entries = self.recordings.get(url)
+            if not entries:
+                return None
+            i = self._served.get(url, 0)
+            self._served[url] = i + 1
+            return entries[min(i, len(entries) - 1)]
+
+    def rewind(self):
+        """Serve every URL's recordings from the start again."""
+        with self._lock:
+            self._served.clear()
+
+    def get(self, url, timeout=None, headers=None, session=None):
+        entry = self._next(url)
+        if entry is None:
+            return _unrecorded(url)
+        delay = entry.get("latency_ms", 0) / 1000 * self.latency
+        limit = _limit(timeout)
+        if limit is not None and delay > limit:
+            time.sleep(limit)
+            raise requests.Timeout(f"Replayed latency {delay:.2f}s exceeds timeout {limit:.2f}s for {url}")
+        if delay > 0:
+            time.sleep(delay)
+        if entry.get("error"):
+            exc = getattr(requests.exceptions, entry["error"], None)
+            if not (isinstance(exc, type) and issubclass(exc, requests.RequestException)):
+                exc = requests.ConnectionError
+            raise exc(entry.get("message", ""))
+        return _response(entry)
+
+
+def _response(entry):
+    resp = requests.Response()
+    resp.url = entry.get("final_url") or entry["url"]
+    resp.status_code = entry["status"]
+    resp.reason = entry.get("reason")
+    resp.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    resp.encoding = entry.get("encoding")
+    if "body_b64" in entry:
+        resp._content = base64.b64decode(entry["body_b64"])
+    else:
+        resp._content = entry.get("body", "").encode("utf-8")
+    return resp
+
+
+def _unrecorded(url):
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = 404
+    resp.reason = "Not Recorded"
+    resp.headers = CaseInsensitiveDict({"Content-Type": "text/plain"})
+    resp._content = b""
+    # Says nothing about the host; see fetcher.guarded_get()
+    resp.replay_unrecorded = True
+    return resp
+
+
+def from_env():
+    """Transport selected by FETCH_RECORD / FETCH_REPLAY, or None for live fetches."""
+    record = os.getenv("FETCH_RECORD")
+    replay = os.getenv("FETCH_REPLAY")
+    if record and replay:
+        raise ValueError("Set only one of FETCH_RECORD and FETCH_REPLAY")
+    if record:
+        return Recorder(record)
+    if replay:
+        return Replayer(replay, latency=float(os.getenv("FETCH_REPLAY_LATENCY", "0")))
+    return None
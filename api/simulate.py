@@ -0,0 +1,267 @@
+"""
+Monte Carlo replay of ticket-picking strategies against the stored history.
+
+For every replayed draw each strategy generates `tickets_per_draw` tickets
+using only the draws before it, and every ticket is scored against the real
+result. Tickets and draws are represented as bitmasks (bit n set for ball n,
+the same layout as the packed export), so matching is one AND plus a popcount
+per ticket.
+
+Strategies:
+
+    random        uniform picks
+    hot           weighted by how often each ball came up in the last `window` draws
+    cold          weighted towards the balls that came up least in that window
+    avoid_recent  uniform over balls not drawn in the last `avoid` draws
+                  (at most MAX_AVOID, so at least two stars stay eligible)
+
+Work is split into batches of draws, each with its own child of one
+SeedSequence, and the batches run on a ProcessPoolExecutor. Results are summed,
+so a given seed gives the same totals whatever the worker count. Once
+`cpu_budget` seconds of worker CPU time have been spent no further batches are
+submitted and the report is marked truncated.
+
+Command line:
+
+    python -m api.simulate --strategies random,hot --tickets-per-draw 10000 --seed 42
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from .analytics import load_arrays
+
+STRATEGIES = ("random", "hot", "cold", "avoid_recent")
+MAIN_MAX = 50
+STAR_MAX = 12
+
+# (main matches, star matches) combinations that win a prize, best first
+PRIZE_TIERS = [(5, 2), (5, 1), (5, 0), (4, 2), (4, 1), (3, 2), (4, 0),
+               (2, 2), (3, 1), (3, 0), (1, 2), (2, 1), (2, 0)]
+
+# Each draw rules out two of the 12 stars; beyond this avoid_recent could run out
+MAX_AVOID = (STAR_MAX - 2) // 2
+
+# Keep each batch's (tickets, 50) float32 key matrix around 40 MB
+BATCH_TICKETS = 200_000
+
+_history = {}
+
+
+def _onehot(balls, size):
+    """(N, size + 1) counts of each ball per draw; column 0 is unused."""
+    out = np.zeros((len(balls), size + 1), dtype=np.int32)
+    np.put_along_axis(out, balls, 1, axis=1)
+    return out
+
+
+def _prior_counts(onehot, start, end, window):
+    """Per-ball counts over the `window` draws before each draw in [start, end)."""
+    cum = np.concatenate([np.zeros((1, onehot.shape[1]), dtype=np.int64), np.cumsum(onehot, axis=0)])
+    idx = np.arange(start, end)
+    return (cum[idx] - cum[np.maximum(idx - window, 0)])[:, 1:]
+
+
+def strategy_weights(strategy, onehot, start, end, window=50, avoid=2):
+    """Sampling weights, one row per draw in [start, end), one column per ball."""
+    n = end - start
+    size = onehot.shape[1] - 1
+    if strategy == "random":
+        return np.ones((n, size))
+    if strategy == "hot":
+        return _prior_counts(onehot, start, end, window) + 1.0
+    if strategy == "cold":
+        counts = _prior_counts(onehot, start, end, window)
+        return (counts.max(axis=1, keepdims=True) - counts) + 1.0
+    if strategy == "avoid_recent":
+        return (_prior_counts(onehot, start, end, avoid) == 0).astype(float)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def sample_masks(weights, k, rng):
+    """
+    Draw k distinct balls per row of float32 `weights`, proportional to weight, as
+    uint64 bitmasks. Uses the Gumbel top-k trick so a whole batch is sampled
+    with one argpartition instead of a Python loop per ticket. Rows with fewer
+    than k positive weights are sampled uniformly.
+    """
+    short = np.count_nonzero(weights > 0, axis=1) < k
+    if short.any():
+        weights = np.where(short[:, None], np.float32(1), weights)
+    with np.errstate(divide="ignore"):
+        keys = np.log(weights)
+    # float32 uniforms can be exactly 0; clamp so the Gumbel noise stays finite
+    u = np.maximum(rng.random(weights.shape, dtype=np.float32), np.finfo(np.float32).tiny)
+    keys -= np.log(-np.log(u))
+    picks = np.argpartition(-keys, k - 1, axis=1)[:, :k] + 1
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), picks.astype(np.uint64)), axis=1)
+
+
+def _draw_masks(balls):
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), balls.astype(np.uint64)), axis=1)
+
+
+def build_history(mains, stars):
+    return {
+        "mains": mains,
+        "stars": stars,
+        "main_onehot": _onehot(mains, MAIN_MAX),
+        "star_onehot": _onehot(stars, STAR_MAX),
+        "main_masks": _draw_masks(mains),
+        "star_masks": _draw_masks(stars),
+    }
+
+
+def _init_worker(mains, stars):
+    _history.update(build_history(mains, stars))
+
+
+def run_batch(strategy, start, end, tickets_per_draw, seed, window, avoid, history=None):
+    """
+    Score `tickets_per_draw` tickets for every draw in [start, end) against
+    `history` (default: the one _init_worker loaded into this pool process).
+    Returns (strategy, 6x3 match-count matrix, tickets, cpu_seconds).
+    """
+    cpu_started = time.process_time()
+    rng = np.random.default_rng(seed)
+    h = _history if history is None else history
+    ticket_mains = sample_masks(np.repeat(
+        strategy_weights(strategy, h["main_onehot"], start, end, window, avoid).astype(np.float32),
+        tickets_per_draw, axis=0), 5, rng)
+    ticket_stars = sample_masks(np.repeat(
+        strategy_weights(strategy, h["star_onehot"], start, end, window, avoid).astype(np.float32),
+        tickets_per_draw, axis=0), 2, rng)
+
+    m = np.bitwise_count(ticket_mains & np.repeat(h["main_masks"][start:end], tickets_per_draw))
+    s = np.bitwise_count(ticket_stars & np.repeat(h["star_masks"][start:end], tickets_per_draw))
+    matrix = np.bincount(m.astype(np.int64) * 3 + s, minlength=18).reshape(6, 3)
+    return strategy, matrix, len(m), time.process_time() - cpu_started
+
+
+def _summarize(matrix, tickets):
+    mains_hist = matrix.sum(axis=1)
+    stars_hist = matrix.sum(axis=0)
+    tiers = {f"{m}+{s}": int(matrix[m, s]) for m, s in PRIZE_TIERS}
+    winners = sum(tiers.values())
+    return {
+        "tickets": int(tickets),
+        "prize_tiers": tiers,
+        "winning_tickets": winners,
+        "win_rate": round(winners / tickets, 6) if tickets else 0.0,
+        "mean_main_matches": round(float(mains_hist @ np.arange(6)) / tickets, 6) if tickets else 0.0,
+        "mean_star_matches": round(float(stars_hist @ np.arange(3)) / tickets, 6) if tickets else 0.0,
+    }
+
+
+def run_simulation(rows, strategies=STRATEGIES, tickets_per_draw=1000, seed=0,
+                   workers=None, cpu_budget=None, window=50, avoid=2, since=None):
+    """
+    Replay `strategies` over draw rows (any order). Draws on or after `since`
+    (YYYY-MM-DD) are scored; earlier ones only feed the strategies' history.
+    workers <= 1 runs the batches in this process.
+    """
+    for name in strategies:
+        if name not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {name}")
+    if not 0 <= avoid <= MAX_AVOID:
+        raise ValueError(f"avoid must be between 0 and {MAX_AVOID}")
+    mains, stars, dates = load_arrays(rows)
+    # load_arrays keeps the input order; replay oldest first
+    order = np.argsort(np.array([str(d)[:10] for d in dates], dtype="U10"), kind="stable")
+    mains, stars = mains[order], stars[order]
+    dates = [str(dates[i])[:10] for i in order]
+    first = next((i for i, d in enumerate(dates) if not since or d >= since), len(dates))
+
+    per_batch = max(1, BATCH_TICKETS // max(1, tickets_per_draw))
+    ranges = [(a, min(a + per_batch, len(dates))) for a in range(first, len(dates), per_batch)]
+    # Interleave strategies so a budget cut leaves them scored over the same draws
+    tasks = [(name, a, b) for a, b in ranges for name in strategies]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    args = [(name, a, b, tickets_per_draw, seeds[i], window, avoid) for i, (name, a, b) in enumerate(tasks)]
+
+    workers = workers or os.cpu_count() or 1
+    totals = {name: [np.zeros((6, 3), dtype=np.int64), 0] for name in strategies}
+    cpu_used = 0.0
+    submitted = 0
+    started = time.perf_counter()
+
+    def collect(result):
+        nonlocal cpu_used
+        name, matrix, tickets, cpu = result
+        totals[name][0] += matrix
+        totals[name][1] += tickets
+        cpu_used += cpu
+
+    if workers <= 1:
+        # Local rather than the module global: concurrent requests each run their own
+        history = build_history(mains, stars)
+        for a in args:
+            if cpu_budget is not None and cpu_used >= cpu_budget:
+                break
+            collect(run_batch(*a, history=history))
+            submitted += 1
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mains, stars)) as pool:
+            pending = set()
+            while submitted < len(args) or pending:
+                # Keep every worker busy with a small backlog, stop feeding once over budget
+                while submitted < len(args) and len(pending) < workers * 2 and (cpu_budget is None or cpu_used < cpu_budget):
+                    pending.add(pool.submit(run_batch, *args[submitted]))
+                    submitted += 1
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    collect(f.result())
+
+    return {
+        "seed": seed,
+        "tickets_per_draw": tickets_per_draw,
+        "draws_replayed": len(dates) - first,
+        "from": dates[first] if first < len(dates) else None,
+        "to": dates[-1] if dates else None,
+        "window": window,
+        "avoid": avoid,
+        "workers": workers,
+        "batches": len(args),
+        "batches_run": submitted,
+        "truncated": submitted < len(args),
+        "cpu_seconds": round(cpu_used, 3),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "strategies": {name: _summarize(m, t) for name, (m, t) in totals.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay ticket-picking strategies against the stored draw history.")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="comma-separated subset of " + ", ".join(STRATEGIES))
+    parser.add_argument("--tickets-per-draw", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: CPU count)")
+    parser.add_argument("--cpu-budget", type=float, default=None, help="stop submitting batches after this many CPU seconds")
+    parser.add_argument("--window", type=int, default=50, help="draws of history for hot/cold")
+    parser.add_argument("--avoid", type=int, default=2, help=f"recent draws excluded by avoid_recent (0-{MAX_AVOID})")
+    parser.add_argument("--since", default=None, help="first draw date to score (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    from .db import iter_draws
+    report = run_simulation(
+        list(iter_draws()),
+        strategies=[s.strip() for s in args.strategies.split(",") if s.strip()],
+        tickets_per_draw=args.tickets_per_draw,
+        seed=args.seed,
+        workers=args.workers,
+        cpu_budget=args.cpu_budget,
+        window=args.window,
+        avoid=args.avoid,
+        since=args.since,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+In-memory snapshot of the whole draws table for the read endpoints.
+
+The history is a few thousand small rows, so each process keeps all of it as
+a newest-first list of JSON-ready dicts with a per-year (start, end) offset
+index found by binary search. /api/draws, /api/draws?year= and /api/latest
+become list slices.
+
+A snapshot is immutable once built. Refreshes build a new one off to the side
+and replace the module-level reference in a single assignment, so readers
+never block and never see a half-built state. A refresh is scheduled in the
+background after every committed insert/update, in this process or (through
+the database's LISTEN/NOTIFY change listener) in any other, and whenever the
+current snapshot outlives its TTL; the stale snapshot keeps serving meanwhile.
+The TTL is DRAWS_SNAPSHOT_TTL seconds (default 60), or
+DRAWS_SNAPSHOT_LISTEN_TTL (default 3600) while the change listener (started
+by long-lived servers, see gunicorn.conf.py) is connected. Set DRAWS_SNAPSHOT=0 to read from the database on every request
+instead.
+"""
+import os
+import threading
+import time
+from contextlib import nullcontext
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from . import db
+
+SNAPSHOT_TTL = float(os.getenv('DRAWS_SNAPSHOT_TTL', '60'))
+# Changes from other processes arrive as notifications, so expiry is only a backstop
+SNAPSHOT_LISTEN_TTL = float(os.getenv('DRAWS_SNAPSHOT_LISTEN_TTL', '3600'))
+
+# Delay before retrying a failed first build (empty table or database
+# down), doubling per failure up to SNAPSHOT_TTL
+BUILD_RETRY_SECONDS = 1.0
+
+_current = None
+_build_lock = threading.Lock()
+_retry_at = 0.0
+_retry_delay = BUILD_RETRY_SECONDS
+_state_lock = threading.Lock()
+_refreshing = False
+_pending = False
+# Set when a pending refresh follows a change notification
+_pending_primary = False
+
+
+def enabled():
+    return os.getenv('DRAWS_SNAPSHOT', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class Snapshot:
+    """Immutable, newest-first view of every stored draw."""
+
+    def __init__(self, rows):
+        pairs = sorted(((_as_date(r['draw_date']), r) for r in rows), key=lambda p: p[0], reverse=True)
+        self.rows = []
+        for d, r in pairs:
+            row = dict(r)
+            row['draw_date'] = d.isoformat()
+            self.rows.append(row)
+        # Negated ordinals are ascending, which is what bisect needs
+        self._keys = [-d.toordinal() for d, _ in pairs]
+        self.years = {}
+        for year in {d.year for d, _ in pairs}:
+            self.years[year] = (
+                bisect_left(self._keys, -date(year, 12, 31).toordinal()),
+                bisect_right(self._keys, -date(year, 1, 1).toordinal()),
+            )
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def draws(self, limit=None, year=None):
+        """Same rows and order as db.get_draws(limit, year)."""
+        start, end = self.years.get(year, (0, 0)) if year else (0, len(self.rows))
+        if limit and limit > 0:
+            end = min(end, start + limit)
+        return self.rows[start:end]
+
+    def latest(self):
+        return self.rows[0] if self.rows else None
+
+
+def _rebuild(primary=False):
+    """
+    Load every draw and swap the new snapshot in. Keeps the old one if the
+    read fails. Reads go to the replica or local store like any other read,
+    unless `primary` is set because a change was just notified (it may not
+    have reached a replica yet).
+    """
+    global _current
+    with db.primary_reads() if primary else nullcontext():
+        rows = db.get_draws()
+    # get_draws() returns [] on errors too; never replace real data with nothing
+    if not rows:
+        return False
+    _current = Snapshot(rows)
+    return True
+
+
+def _refresh_loop():
+    global _refreshing, _pending, _pending_primary
+    while True:
+        with _state_lock:
+            if not _pending:
+                _refreshing = False
+                return
+            primary = _pending_primary
+            _pending = _pending_primary = False
+        try:
+            _rebuild(primary=primary)
+        except Exception as e:
+            print(f"Error rebuilding draws snapshot: {e}", flush=True)
+
+
+def schedule_refresh(primary=False):
+    """
+    Rebuild in a background thread. Requests made while a rebuild is running
+    coalesce into one more rebuild after it, so the latest write is covered;
+    it reads from the primary if any of them asked for that.
+    """
+    global _refreshing, _pending, _pending_primary
+    with _state_lock:
+        _pending = True
+        _pending_primary = _pending_primary or primary
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=_refresh_loop, name='draws-snapshot', daemon=True).start()
+
+
+def _first_build():
+    """
+    Build the first snapshot in the calling thread. Only one thread tries at
+    a time and a failure is not retried until its backoff has passed; every
+    other caller gets None straight away and reads the database instead.
+    """
+    global _retry_at, _retry_delay
+    if time.monotonic() < _retry_at or not _build_lock.acquire(blocking=False):
+        return None
+    try:
+        if _current is None:
+            try:
+                built = _rebuild()
+            except Exception as e:
+                print(f"Error building draws snapshot: {e}", flush=True)
+                built = False
+            if built:
+                _retry_delay = BUILD_RETRY_SECONDS
+            else:
+                _retry_at = time.monotonic() + _retry_delay
+                _retry_delay = min(_retry_delay * 2, SNAPSHOT_TTL)
+    finally:
+        _build_lock.release()
+    return _current
+
+
+def get_snapshot():
+    """
+    Current snapshot, or None when disabled or not built yet. Only the call
+    that builds the first snapshot waits for it.
+    """
+    if not enabled():
+        return None
+    snap = _current
+    if snap is None:
+        return _first_build()
+    ttl = SNAPSHOT_LISTEN_TTL if db.change_listener_active() else SNAPSHOT_TTL
+    if time.monotonic() - snap.built_at > ttl:
+        schedule_refresh()
+    return snap
+
+
+@db.on_draw_change
+def _on_draw_change(draw_date, change):
+    if _current is not None:
+        schedule_refresh(primary=True)
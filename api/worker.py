@@ -0,0 +1,90 @@
+"""
+Worker for queued sync jobs.
+
+/api/sync and /api/sync_date enqueue into the sync_jobs table instead of
+scraping inline when SYNC_QUEUE is set (or with ?mode=queue). Any number of
+workers can run side by side; each claims one job at a time with
+FOR UPDATE SKIP LOCKED, runs the same sync code as the inline endpoints and
+stores the response body, status and timings on the job (see
+/api/jobs/<id>).
+
+    python -m api.worker            # run until interrupted
+    python -m api.worker --once     # drain the queue and exit
+"""
+import argparse
+import os
+import socket
+import time
+import traceback
+
+from .db import claim_sync_job, finish_sync_job
+from .index import app, run_sync, run_sync_date, run_sync_latest
+
+POLL_SECONDS = float(os.getenv('SYNC_WORKER_POLL_SECONDS', '2'))
+
+_PATHS = {"latest": "/api/sync", "date": "/api/sync_date"}
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_job(job):
+    """Run one claimed job; returns (status, http_status, result, error)."""
+    params = job.get("params") or {}
+    kind = job["kind"]
+    if kind == "latest":
+        fn, args, kwargs = run_sync_latest, (), {"force": bool(params.get("force"))}
+    elif kind == "date":
+        fn, args, kwargs = run_sync_date, (job["target_date"],), {"collect_debug": bool(params.get("debug"))}
+    else:
+        return "failed", None, None, f"Unknown job kind {kind!r}"
+    # The sync code builds Flask responses, so give it the request it expects
+    with app.test_request_context(_PATHS[kind]):
+        resp = run_sync(fn, *args, **kwargs)
+        result = resp.get_json(silent=True)
+    status = "done" if resp.status_code < 400 else "failed"
+    error = None
+    if status == "failed" and isinstance(result, dict):
+        error = result.get("error")
+    return status, resp.status_code, result, error
+
+
+def work(once=False, poll=POLL_SECONDS):
+    """Claim and run jobs until interrupted (or the queue is empty with once=True)."""
+    name = worker_name()
+    while True:
+        job = claim_sync_job(name)
+        if not job:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+        started = time.monotonic()
+        try:
+            status, http_status, result, error = run_job(job)
+        except Exception as e:
+            status, http_status, result = "failed", None, {"trace": traceback.format_exc()}
+            error = str(e)
+        elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        finish_sync_job(job["id"], status, http_status, result, error)
+        print(
+            f"Job {job['id']} {job['kind']} {job['target_date']}: {status} "
+            f"({http_status}) in {elapsed_ms}ms, attempt {job['attempts']}",
+            flush=True,
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    ap.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between polls of an empty queue")
+    args = ap.parse_args()
+    try:
+        work(once=args.once, poll=args.poll)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Offline, deterministic benchmark of the sync routes.
+
+Record a fixture bundle once against the live sources, then replay it as
+often as needed without network access. Each replay run starts from an empty
+embedded SQLite store (STORAGE_MODE=sqlite) and fresh breaker and ranking
+state, so every run takes the same path through the primary fetch and
+fallback chains.
+
+    python -m bench.sync_replay --record sync.json.gz --route "/api/sync_date?date=2026-10-16"
+    python -m bench.sync_replay --replay sync.json.gz --route "/api/sync_date?date=2026-10-16" --runs 20
+    python -m bench.sync_replay --replay sync.json.gz --latency 1 --baseline before.json --output after.json
+
+Routes default to "/api/sync?force=1". The parse cache is off unless
+--parse-cache is given, so every run parses. A replay exits 1 if any run's
+response differs from the first (timings aside), or with --baseline if a
+route's p50 regresses by more than --max-regression.
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Timing-dependent fields left out of the determinism check
+VOLATILE_KEYS = {"elapsed_ms", "mean_ms", "score", "trace", "parse_cache"}
+
+
+def _stable(value):
+    if isinstance(value, dict):
+        return {k: _stable(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_stable(v) for v in value]
+    return value
+
+
+def digest(status, body):
+    text = json.dumps([status, _stable(body)], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _fresh_state(db, sqlite_path):
+    """Empty draw store for the next run."""
+    db.reset_after_fork()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(sqlite_path + suffix):
+            os.remove(sqlite_path + suffix)
+
+
+def run_route(client, route):
+    started = time.perf_counter()
+    resp = client.get(route)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return resp.status_code, resp.get_json(silent=True), elapsed_ms
+
+
+def _summary(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return {
+        "runs": len(samples_ms),
+        "min_ms": round(samples_ms[0], 2),
+        "p50_ms": round(statistics.median(samples_ms), 2),
+        "p95_ms": round(samples_ms[min(len(samples_ms) - 1, int(0.95 * len(samples_ms)))], 2),
+        "max_ms": round(samples_ms[-1], 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", metavar="BUNDLE", help="fetch live and record into BUNDLE")
+    mode.add_argument("--replay", metavar="BUNDLE", help="serve fetches from BUNDLE")
+    ap.add_argument("--route", action="append", help="route to run (repeatable), default /api/sync?force=1")
+    ap.add_argument("--runs", type=int, default=10, help="replay runs per route")
+    ap.add_argument("--latency", type=float, default=0.0, help="replay this multiple of recorded latency")
+    ap.add_argument("--parse-cache", action="store_true", help="leave the parse cache on")
+    ap.add_argument("--output", help="write the JSON report here as well as stdout")
+    ap.add_argument("--baseline", help="earlier replay report to compare against")
+    ap.add_argument("--max-regression", type=float, default=0.2)
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="em-sync-replay-")
+    sqlite_path = os.path.join(workdir, "draws.sqlite3")
+    os.environ.update(STORAGE_MODE="sqlite", SQLITE_PATH=sqlite_path)
+    os.environ.pop("FETCH_RECORD", None)
+    os.environ.pop("FETCH_REPLAY", None)
+    if not args.parse_cache:
+        os.environ["PARSE_CACHE"] = "0"
+
+    from api import db, fetcher
+    from api.index import app
+    from api.replay import Recorder, Replayer
+
+    routes = args.route or ["/api/sync?force=1"]
+    client = app.test_client()
+
+    if args.record:
+        recorder = Recorder(args.record)
+        fetcher.set_transport(recorder)
+        for route in routes:
+            _fresh_state(db, sqlite_path)
+            status, body, elapsed_ms = run_route(client, route)
+            print(f"{route}: {status} in {elapsed_ms:.0f}ms", file=sys.stderr)
+        print(f"Recorded {len(recorder.bundle['entries'])} responses to {args.record}", file=sys.stderr)
+        return
+
+    replayer = Replayer(args.replay, latency=args.latency)
+    fetcher.set_transport(replayer)
+    results = []
+    mismatches = []
+    for route in routes:
+        samples, digests, first = [], [], None
+        for _ in range(args.runs):
+            _fresh_state(db, sqlite_path)
+            replayer.rewind()
+            status, body, elapsed_ms = run_route(client, route)
+            samples.append(elapsed_ms)
+            digests.append(digest(status, body))
+            if first is None:
+                first = {"status": status, "change": (body or {}).get("change"), "error": (body or {}).get("error")}
+        if len(set(digests)) > 1:
+            mismatches.append(f"{route}: responses differ across runs ({len(set(digests))} variants)")
+        results.append({"route": route, **first, "digest": digests[0], **_summary(samples)})
+        print(f"{route}: {first['status']} p50 {results[-1]['p50_ms']}ms p95 {results[-1]['p95_ms']}ms",
+              file=sys.stderr)
+
+    report = {
+        "config": {"bundle": os.path.basename(args.replay), "runs": args.runs, "latency": args.latency,
+                   "parse_cache": args.parse_cache},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    failures = list(mismatches)
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = {r["route"]: r for r in json.load(f).get("results", [])}
+        for r in results:
+            b = previous.get(r["route"])
+            if not b:
+                continue
+            if b["digest"] != r["digest"]:
+                failures.append(f"{r['route']}: response changed from baseline")
+            if r["p50_ms"] > b["p50_ms"] * (1 + args.max_regression):
+                failures.append(f"{r['route']}: p50 {b['p50_ms']}ms -> {r['p50_ms']}ms")
+    for line in failures:
+        print(f"FAIL {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
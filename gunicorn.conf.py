@@ -0,0 +1,87 @@
+"""
+Gunicorn settings for running the API outside Vercel:
+
+    gunicorn api.index:app
+
+Gunicorn picks this file up from the working directory. Every setting can be
+overridden with the environment variables below or on the command line.
+
+The app is preloaded in the master. Each forked worker drops any database
+state it inherited, starts its draw change listener, opens its pooled
+database connections (one per thread) and serves /api/latest and the
+current year's draws once before accepting connections, so no client pays
+the cold-path cost. Warmup gives up after GUNICORN_WARMUP_TIMEOUT seconds
+so a slow database cannot hold the worker past its boot timeout.
+Workers are recycled after GUNICORN_MAX_REQUESTS requests (with jitter so
+they do not all restart together) and get GUNICORN_GRACEFUL_TIMEOUT seconds
+to finish in-flight requests.
+"""
+import multiprocessing
+import os
+import threading
+
+# Long-lived workers keep a LISTEN connection for cross-process cache
+# invalidation (off by default for serverless deployments). Set before the
+# app is preloaded, which reads it.
+os.environ.setdefault("DB_LISTEN", "1")
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Requests mostly wait on Postgres or upstream HTTP, so threads per worker
+# carry the concurrency and one process per core covers the CPU-bound parts
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# Workers are long-lived, so each keeps one idle connection per thread
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+preload_app = True
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Sync routes can spend a while on upstream fetches
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Must stay well under `timeout`, or a worker stuck warming up is killed and respawned in a loop
+warmup_timeout = float(os.getenv("GUNICORN_WARMUP_TIMEOUT", str(min(20, timeout / 2))))
+
+# Heartbeat files on tmpfs so a slow disk cannot make workers look hung
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    from api import db
+    from api.index import warm_up
+
+    db.reset_after_fork()
+    db.start_change_listener()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["timings"] = warm_up()
+        except Exception as e:
+            outcome["error"] = e
+
+    # Daemon thread: if it overruns, serving starts anyway and warmup finishes in the background
+    thread = threading.Thread(target=run, name="warmup", daemon=True)
+    thread.start()
+    thread.join(warmup_timeout)
+    if thread.is_alive():
+        server.log.warning("Worker %s warmup still running after %ss; serving anyway", worker.pid, warmup_timeout)
+        return
+    if "error" in outcome:
+        server.log.warning("Worker %s warmup failed: %s", worker.pid, outcome["error"])
+        return
+    timings = outcome["timings"]
+    summary = ", ".join(f"{path} {status} in {ms}ms" for path, (status, ms) in timings.items())
+    server.log.info("Worker %s warmed: %s", worker.pid, summary)
+
+
+def worker_exit(server, worker):
+    server.log.info("Worker %s exiting after %s requests", worker.pid, getattr(worker, "nr", "?"))
@@ -0,0 +1,30 @@
+import json
+from datetime import date
+
+import numpy as np
+
+from api.export import DTYPE_HEADER, NUMPY_DTYPE, RECORD_SIZE, encode_csv, encode_packed
+
+
+def test_packed_record_round_trips_through_advertised_dtype():
+    sample = {'draw_date': date(2004, 2, 13), 'numbers': [50, 7, 1, 49, 23], 'stars': [12, 1]}
+    dtype = np.dtype(json.loads(DTYPE_HEADER))
+    assert dtype == np.dtype(NUMPY_DTYPE)
+    assert dtype.itemsize == RECORD_SIZE
+
+    rec = np.frombuffer(encode_packed([sample]), dtype=dtype)[0]
+    assert str(rec['day'].astype('datetime64[D]')) == '2004-02-13'
+    assert [n for n in range(1, 51) if int(rec['mains']) >> n & 1] == [1, 7, 23, 49, 50]
+    assert [n for n in range(1, 13) if int(rec['stars']) >> n & 1] == [1, 12]
+
+
+def test_csv_and_packed_skip_the_same_incomplete_rows():
+    rows = [
+        {'draw_date': '2024-01-05', 'numbers': [1, 2, 3, 4, 5], 'stars': [1, 2]},
+        {'draw_date': '2024-01-02', 'numbers': [1, 2, 3, 4], 'stars': [1, 2]},
+        {'draw_date': '2023-12-29', 'numbers': [6, 7, 8, 9, 10], 'stars': None},
+    ]
+    csv_rows = encode_csv(rows).decode().splitlines()[1:]
+    packed = np.frombuffer(encode_packed(rows), dtype=np.dtype(NUMPY_DTYPE))
+    assert len(csv_rows) == len(packed) == 1
+    assert csv_rows[0].startswith('2024-01-05,')